@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -9,24 +8,29 @@ from models import load_model, save_model, winsorize, retrain_model
 from prediction import FNOL_prediction
 from retrain_dashboard import show_retraining_ui
 from visualization import visualization_dashboard
+from durations import duration_dashboard
+from claims_store import Claims_path, load_claims_data, store_generation, generation_of
 
 # Load environment variables
 load_dotenv(override=True)
 
 # ----------------- Data Loading -----------------
-@st.cache_data
-def load_claims_data():
+def get_claims_data():
     """
     Load FNOL claims CSV safely.
-    Uses relative path for portability.
+    Uses relative path for portability. Reloads when the store has been
+    written since this session last read it, e.g. by another session.
     """
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(base_dir, "FNOL_DATA", "Claims_Policy_merged_cleaned.csv")
-
-    if not os.path.exists(data_path):
-        st.error(f"Claims CSV not found at: {data_path}")
+    if not os.path.exists(Claims_path):
+        st.error(f"Claims CSV not found at: {Claims_path}")
         st.stop()
-    return pd.read_csv(data_path)
+
+    generation = store_generation()
+    claims_data = st.session_state.get("claims_data")
+    if claims_data is None or generation_of(claims_data) != generation:
+        claims_data = load_claims_data(generation)
+        st.session_state["claims_data"] = claims_data
+    return claims_data
 
 
 # ----------------- Main App -----------------
@@ -38,15 +42,14 @@ def main():
     )
 
     # Load data (cached)
-    if "claims_data" not in st.session_state:
-        st.session_state["claims_data"] = load_claims_data()
-    claims_data = st.session_state["claims_data"]
+    claims_data = get_claims_data()
 
     # ---------------- Sidebar Navigation ----------------
     st.sidebar.title("Navigation")
     app_sections = {
         "🏠 Claim Overview": lambda: Customer_overview(Claims_df=claims_data),
         "📊 Visualizations": lambda: visualization_dashboard(claims_data=claims_data),
+        "⏱️ Settlement & FNOL Delay": lambda: duration_dashboard(claims_data=claims_data),
         "🧮 FNOL Prediction": lambda: FNOL_prediction(claims_data=claims_data),
         "🔄 Model Retraining": show_retraining_ui
     }
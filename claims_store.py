@@ -0,0 +1,148 @@
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from models import parse_dates, claim_keys
+
+
+# Claims store: the cleaned, merged claims CSV the dashboard reads
+Base_dir = os.path.dirname(os.path.abspath(__file__))
+Claims_path = os.path.join(Base_dir, "FNOL_DATA", "Claims_Policy_merged_cleaned.csv")
+
+Prediction_prefix = "Predicted_Ultimate_"
+
+# Streamlit sessions share this process, so every store write holds the lock
+_store_lock = threading.RLock()
+
+# Writes that keep existing rows' claim data intact (appends, new prediction columns):
+# generation after the write -> (generation before it, rows in the store before it)
+_history = {}
+
+
+def store_generation():
+    """
+    Identifies the current contents of the store file. Changes on every
+    write, including edits made outside the app.
+    """
+    stat = os.stat(Claims_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def generation_of(claims_data):
+    """
+    Store generation a claims frame was read at, None if it did not come from the store.
+    """
+    return claims_data.attrs.get("generation")
+
+
+def rows_at(generation, since):
+    """
+    Rows the store held at `generation`, if every write between it and the
+    later generation `since` kept existing rows intact. None otherwise,
+    in which case anything derived from the older rows must be rebuilt.
+    """
+    rows = None
+    while since != generation:
+        if since not in _history:
+            return None
+        since, rows = _history[since]
+    return rows
+
+
+def _tagged(claims_data, generation):
+    claims_data.attrs["generation"] = generation
+    return claims_data
+
+
+def load_claims():
+    with _store_lock:
+        generation = store_generation()
+        return _tagged(pd.read_csv(Claims_path), generation)
+
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_claims_data(generation):
+    """
+    Claims store contents, shared across sessions. Keyed on the store
+    generation, and cleared by every write, so a write is never served stale.
+    """
+    return load_claims()
+
+
+def _current(claims_data):
+    # The caller's frame if it is the store's latest contents, else a fresh read
+    if generation_of(claims_data) == store_generation():
+        return claims_data
+    return load_claims()
+
+
+def save_claims(claims_data):
+    # Write to a temporary file and swap it in, so readers never see a partial CSV
+    temp_path = Claims_path + ".tmp"
+    claims_data.to_csv(temp_path, index=False)
+    os.replace(temp_path, Claims_path)
+
+
+def prediction_versions(claims_data):
+    """
+    Model versions that have written prediction columns, oldest first.
+    """
+    return [
+        column[len(Prediction_prefix):]
+        for column in claims_data.columns
+        if column.startswith(Prediction_prefix)
+    ]
+
+
+def write_prediction_columns(claims_data, columns):
+    """
+    Add prediction columns for the first len(columns) claims of the store
+    and return the updated data. Claims appended by other sessions since
+    claims_data was read are kept, with empty predictions.
+    """
+    with _store_lock:
+        previous = store_generation()
+        claims_data = _current(claims_data).copy()
+
+        for column in columns.columns:
+            claims_data[column] = pd.Series(columns[column].to_numpy()).reindex(claims_data.index)
+        save_claims(claims_data)
+
+        generation = store_generation()
+        _history[generation] = (previous, len(claims_data))
+        load_claims_data.clear()
+        return _tagged(claims_data, generation)
+
+
+def _claim_keys(claims, columns):
+    return claim_keys(parse_dates(claims[columns].copy()))
+
+
+def append_claims(claims_data, new_claims):
+    """
+    Append new claims to the end of the store and return the combined data
+    and the number of claims added. Claims already in the store, or repeated
+    within new_claims, are skipped, so the same upload can't be added twice.
+    The store is append-only, so anything indexed by row position can
+    refresh from just the new rows.
+    """
+    with _store_lock:
+        previous = store_generation()
+        claims_data = _current(claims_data)
+
+        # Claim_ID when both sides have it, otherwise the raw claim fields they share
+        key_columns = [col for col in new_claims.columns if col in claims_data.columns]
+        new_keys = pd.Series(_claim_keys(new_claims, key_columns))
+        duplicate = new_keys.duplicated() | new_keys.isin(_claim_keys(claims_data, key_columns))
+        new_claims = new_claims[~duplicate.to_numpy()].reindex(columns=claims_data.columns)
+
+        if len(new_claims) == 0:
+            return claims_data, 0
+
+        new_claims.to_csv(Claims_path, mode="a", header=False, index=False)
+
+        generation = store_generation()
+        _history[generation] = (previous, len(claims_data))
+        load_claims_data.clear()
+        combined = pd.concat([claims_data, new_claims], ignore_index=True)
+        return _tagged(combined, generation), len(new_claims)
@@ -0,0 +1,295 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import streamlit as st
+from models import derive_durations
+from claims_store import generation_of, rows_at
+
+
+# Segments offered on the page: label -> claims column (None = all claims together)
+Segment_options = {
+    "All Claims": None,
+    "Claim Type": "Claim_Type",
+    "Vehicle Type": "Vehicle_Type",
+    "Weather Condition": "Weather_Condition",
+    "Traffic Condition": "Traffic_Condition"
+}
+
+# Durations are counted per whole day up to this cap; longer ones fall in the last day
+Max_days = 5 * 365
+
+# Materialised per-segment day counts for one version of the claims data,
+# censored as of one day. Replaced as a whole under the lock, never changed in place
+_duration_counts = {"version": None, "generation": None, "as_of": None, "n_claims": 0, "segments": {}}
+_counts_lock = threading.Lock()
+
+
+def _duration_arrays(claims, as_of):
+    """
+    Settlement days (censored at as_of for open claims), settled flag and
+    FNOL delay for each claim, clipped to [0, Max_days].
+    """
+    claims = derive_durations(claims[["Accident_Date", "FNOL_Date", "Settlement_Date"]].copy())
+    fnol = pd.to_datetime(claims["FNOL_Date"], errors="coerce")
+
+    settled = claims["Settlement_days"].notna().to_numpy()
+    open_days = (as_of - fnol).dt.days
+    settle_days = claims["Settlement_days"].fillna(open_days)
+
+    return {
+        "settle_days": settle_days.clip(0, Max_days).fillna(-1).to_numpy(dtype=np.int64),
+        "settled": settled,
+        "delay_days": claims["FNOL_delay_(days)"].clip(0, Max_days).fillna(-1).to_numpy(dtype=np.int64),
+    }
+
+
+def _day_counts(codes, days, n_groups, weights=None):
+    # One bincount over (group, day) cells gives every group's histogram at once
+    valid = (codes >= 0) & (days >= 0)
+    cells = codes[valid] * (Max_days + 1) + days[valid]
+    return np.bincount(
+        cells,
+        weights=None if weights is None else weights[valid],
+        minlength=n_groups * (Max_days + 1)
+    ).reshape(n_groups, Max_days + 1)
+
+
+def _accumulate(state, values, durations):
+    """
+    A segment's counts with new claims added. New categories get fresh rows,
+    so appended claims never trigger a full recount.
+    """
+    values = pd.Series(values).astype(str)
+    labels = state["labels"] + sorted(set(values.unique()) - set(state["labels"]))
+    padding = np.zeros((len(labels) - len(state["labels"]), Max_days + 1))
+
+    n_groups = len(labels)
+    codes = pd.Categorical(values, categories=labels).codes.astype(np.int64)
+
+    # New arrays rather than +=, so sessions still reading the old counts are unaffected
+    return {
+        "labels": labels,
+        "settle_events": np.vstack([state["settle_events"], padding])
+            + _day_counts(codes, durations["settle_days"], n_groups, durations["settled"].astype(float)),
+        "settle_totals": np.vstack([state["settle_totals"], padding])
+            + _day_counts(codes, durations["settle_days"], n_groups),
+        "delay_counts": np.vstack([state["delay_counts"], padding])
+            + _day_counts(codes, durations["delay_days"], n_groups),
+    }
+
+
+def _counts_version(claims_data):
+    """
+    Store generation of the claims data, or for data not read from the
+    store a fingerprint of the dates and segments the counts come from.
+    """
+    generation = generation_of(claims_data)
+    if generation is not None:
+        return generation
+
+    columns = ["Accident_Date", "FNOL_Date", "Settlement_Date"] + [
+        column for column in Segment_options.values() if column is not None
+    ]
+    hashed = pd.util.hash_pandas_object(claims_data[columns], index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:12]
+
+
+def _count_claims(segments, new_claims, as_of):
+    # Every segment's counts with new_claims added
+    durations = _duration_arrays(new_claims, as_of)
+    empty = {
+        "labels": [],
+        "settle_events": np.zeros((0, Max_days + 1)),
+        "settle_totals": np.zeros((0, Max_days + 1)),
+        "delay_counts": np.zeros((0, Max_days + 1)),
+    }
+    return {
+        label: _accumulate(
+            segments.get(label, empty),
+            np.full(len(new_claims), "All Claims") if column is None else new_claims[column],
+            durations
+        )
+        for label, column in Segment_options.items()
+    }
+
+
+def duration_counts(claims_data):
+    """
+    Per-segment settlement and FNOL-delay day counts for the claims data.
+    If the store has only gained rows since the counts were made, just the
+    new rows are counted. Any other change to the data, or a new day (open
+    claims are censored at today), means a full recount. A caller holding
+    older store data is given the current counts.
+    """
+    as_of = pd.Timestamp.today().normalize()
+    version = _counts_version(claims_data)
+    generation = generation_of(claims_data)
+
+    with _counts_lock:
+        counts = _duration_counts
+        if counts["as_of"] == as_of:
+            if counts["version"] == version:
+                return counts["segments"]
+
+            if generation is not None and counts["generation"] is not None:
+                if rows_at(generation, counts["generation"]) == len(claims_data):
+                    return counts["segments"]
+
+                if rows_at(counts["generation"], generation) == counts["n_claims"]:
+                    segments = _count_claims(counts["segments"], claims_data.iloc[counts["n_claims"]:], as_of)
+                    _duration_counts.update({
+                        "version": version,
+                        "generation": generation,
+                        "n_claims": len(claims_data),
+                        "segments": segments
+                    })
+                    return segments
+
+        segments = _count_claims({}, claims_data, as_of)
+        _duration_counts.update({
+            "version": version,
+            "generation": generation,
+            "as_of": as_of,
+            "n_claims": len(claims_data),
+            "segments": segments
+        })
+        return segments
+
+
+def kaplan_meier(state):
+    """
+    Kaplan-Meier probability that a claim is still open after each day,
+    for every group at once. Rows are groups, columns are days.
+    """
+    # Claims still at risk on day t: everyone whose duration is t or longer
+    at_risk = state["settle_totals"][:, ::-1].cumsum(axis=1)[:, ::-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hazard = np.where(at_risk > 0, state["settle_events"] / at_risk, 0.0)
+    return np.cumprod(1 - hazard, axis=1)
+
+
+def _first_day(mask):
+    # First day each row's condition holds, NaN where it never does
+    day = mask.argmax(axis=1).astype(float)
+    day[~mask.any(axis=1)] = np.nan
+    return day
+
+
+def settlement_summary(state):
+    survival = kaplan_meier(state)
+    totals = state["settle_totals"].sum(axis=1)
+    return pd.DataFrame({
+        "Segment": state["labels"],
+        "Claims": totals.astype(int),
+        "Settled": state["settle_events"].sum(axis=1).astype(int),
+        "Median_Days": _first_day(survival <= 0.5),
+        "Settled_30d": 1 - survival[:, 30],
+        "Settled_90d": 1 - survival[:, 90],
+    })
+
+
+def delay_summary(state):
+    counts = state["delay_counts"]
+    totals = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cdf = counts.cumsum(axis=1) / totals[:, None]
+        mean = (counts * np.arange(Max_days + 1)).sum(axis=1) / totals
+    return pd.DataFrame({
+        "Segment": state["labels"],
+        "Claims": totals.astype(int),
+        "Mean_Delay": mean,
+        "Median_Delay": _first_day(cdf >= 0.5),
+        "P90_Delay": _first_day(cdf >= 0.9),
+    })
+
+
+def duration_dashboard(claims_data):
+    st.title("⏱️ Settlement & FNOL Delay Analysis")
+    st.markdown("### Claim cycle times by segment")
+
+    segment = st.selectbox("Segment by", list(Segment_options.keys()))
+
+    with st.spinner("Updating duration analytics..."):
+        state = duration_counts(claims_data)[segment]
+
+    plot_settlement_curves(state)
+    st.markdown("---")
+    plot_delay_distributions(state)
+
+
+def plot_settlement_curves(state):
+    """
+    Kaplan-Meier settlement curves, open claims treated as censored
+    """
+    st.subheader("📉 Settlement Curves (Kaplan-Meier)")
+
+    survival = kaplan_meier(state)
+    summary = settlement_summary(state)
+
+    # Show up to the day by which 99% of claims have settled (or the cap)
+    horizon = int(np.nanmax(np.append(_first_day(survival <= 0.01), 0))) or Max_days
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for label, curve in zip(state["labels"], survival):
+        ax.step(np.arange(horizon + 1), curve[:horizon + 1], where="post", label=label)
+    ax.set_xlabel("Days since FNOL")
+    ax.set_ylabel("Share of claims still open")
+    ax.set_ylim(0, 1.05)
+    ax.legend()
+    plt.tight_layout()
+    st.pyplot(fig)
+
+    formatted_summary = summary.copy()
+    formatted_summary["Claims"] = formatted_summary["Claims"].map(lambda x: f"{x:,}")
+    formatted_summary["Settled"] = formatted_summary["Settled"].map(lambda x: f"{x:,}")
+    formatted_summary["Median_Days"] = formatted_summary["Median_Days"].map(
+        lambda x: "Not reached" if np.isnan(x) else f"{x:,.0f} days"
+    )
+    for col in ["Settled_30d", "Settled_90d"]:
+        formatted_summary[col] = formatted_summary[col].map(lambda x: f"{x:.1%}")
+
+    formatted_summary = formatted_summary.rename(columns={
+        "Claims": "Number of Claims",
+        "Settled": "Settled Claims",
+        "Median_Days": "Median Time to Settle",
+        "Settled_30d": "Settled within 30 Days",
+        "Settled_90d": "Settled within 90 Days"
+    })
+    st.dataframe(formatted_summary, use_container_width=True, hide_index=True)
+
+
+def plot_delay_distributions(state):
+    """
+    Distribution of days between accident and first notice of loss
+    """
+    st.subheader("📊 FNOL Delay Distribution")
+
+    counts = state["delay_counts"]
+    summary = delay_summary(state)
+    horizon = min(int(np.nanmax(np.append(summary["P90_Delay"].to_numpy(), 0))) * 2 or 30, Max_days)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = counts / counts.sum(axis=1, keepdims=True)
+    for label, share in zip(state["labels"], shares):
+        ax.plot(np.arange(horizon + 1), share[:horizon + 1], marker="o", markersize=3, label=label)
+    ax.set_xlabel("FNOL delay (days)")
+    ax.set_ylabel("Share of claims")
+    ax.legend()
+    plt.tight_layout()
+    st.pyplot(fig)
+
+    formatted_summary = summary.copy()
+    formatted_summary["Claims"] = formatted_summary["Claims"].map(lambda x: f"{x:,}")
+    for col in ["Mean_Delay", "Median_Delay", "P90_Delay"]:
+        formatted_summary[col] = formatted_summary[col].map(lambda x: f"{x:,.1f} days")
+
+    formatted_summary = formatted_summary.rename(columns={
+        "Claims": "Number of Claims",
+        "Mean_Delay": "Average Delay",
+        "Median_Delay": "Median Delay",
+        "P90_Delay": "90th Percentile Delay"
+    })
+    st.dataframe(formatted_summary, use_container_width=True, hide_index=True)
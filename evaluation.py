@@ -0,0 +1,147 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from models import model_version
+
+
+Holdout_dir = "models/holdout"
+Segment_columns = ["Claim_Type", "Vehicle_Type"]
+
+
+def _holdout_path(version):
+    return os.path.join(Holdout_dir, f"holdout_v{version}.npz")
+
+
+def latest_holdout_version():
+    versions = [
+        int(os.path.basename(path)[len("holdout_v"):-len(".npz")])
+        for path in glob.glob(os.path.join(Holdout_dir, "holdout_v*.npz"))
+    ]
+    return max(versions) if versions else None
+
+
+def create_holdout(X, y, segments, keys):
+    """
+    Persist a pre-encoded holdout set as the next holdout version.
+    X is the encoded feature frame, y the log-scale target, segments the
+    raw Segment_columns and keys the claim_keys for the same rows; the keys
+    keep holdout claims out of later training sets.
+    """
+    os.makedirs(Holdout_dir, exist_ok=True)
+    version = (latest_holdout_version() or 0) + 1
+
+    arrays = {
+        "X": X.to_numpy(dtype=np.float32),
+        "y": np.asarray(y, dtype=np.float64),
+        "feature_columns": np.asarray(X.columns, dtype=str),
+        "claim_keys": np.asarray(keys, dtype=str),
+    }
+    # Segments are stored as integer codes so error per segment is one bincount
+    for column in Segment_columns:
+        codes, labels = pd.factorize(segments[column].astype(str), sort=True)
+        arrays[f"{column}_codes"] = codes
+        arrays[f"{column}_labels"] = np.asarray(labels, dtype=str)
+
+    np.savez(_holdout_path(version), **arrays)
+    return version
+
+
+def load_holdout(version=None):
+    version = version or latest_holdout_version()
+    if version is None:
+        return None
+
+    with np.load(_holdout_path(version)) as data:
+        holdout = {key: data[key] for key in data.files}
+    holdout["version"] = version
+    holdout["X"] = pd.DataFrame(holdout["X"], columns=list(holdout["feature_columns"]))
+    return holdout
+
+
+def _predictions_path(model, holdout):
+    return os.path.join(
+        Holdout_dir,
+        f"predictions_{model_version(model)}_holdout_v{holdout['version']}.npy"
+    )
+
+
+def holdout_predictions(model, holdout, cache=True):
+    """
+    Log-scale predictions of a model on the holdout. With cache, they are
+    kept on disk per (model version, holdout version) so the champion is
+    only scored once; challengers are cached only if promoted.
+    """
+    path = _predictions_path(model, holdout)
+    if os.path.exists(path):
+        return np.load(path)
+
+    X = holdout["X"].reindex(columns=list(model.feature_names_in_), fill_value=0)
+    predictions = model.predict(X)
+    if cache:
+        save_holdout_predictions(model, holdout, predictions)
+    return predictions
+
+
+def save_holdout_predictions(model, holdout, predictions):
+    np.save(_predictions_path(model, holdout), predictions)
+
+
+def _metrics(actual, predicted):
+    error = predicted - actual
+    ss_res = np.sum(error ** 2)
+    ss_tot = np.sum((actual - actual.mean()) ** 2)
+    return {
+        "RMSE": np.sqrt(ss_res / len(actual)),
+        "MAE": np.abs(error).mean(),
+        "R2": 1 - ss_res / ss_tot if ss_tot > 0 else np.nan,
+    }
+
+
+def _overall_metrics(actual, predictions):
+    return pd.DataFrame(
+        {name: _metrics(actual, predicted) for name, predicted in predictions.items()}
+    ).rename_axis("Metric").reset_index()
+
+
+def _segment_errors(codes, labels, actual, predicted):
+    # One grouped pass per statistic: bincount over the segment codes
+    error = predicted - actual
+    counts = np.bincount(codes, minlength=len(labels))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = np.bincount(codes, weights=np.abs(error), minlength=len(labels)) / counts
+        rmse = np.sqrt(np.bincount(codes, weights=error ** 2, minlength=len(labels)) / counts)
+    return pd.DataFrame({"Segment": labels, "Claim_Count": counts, "MAE": mae, "RMSE": rmse})
+
+
+def compare_models(champion, challenger, holdout):
+    """
+    Champion/challenger comparison on the persistent holdout. Overall
+    metrics are on the log scale the model is trained and promoted on;
+    the claim amount (£) metrics and segment errors are for information.
+    The champion's predictions come from cache, so the challenger costs
+    one predict over the holdout.
+    """
+    log_predictions = {
+        "Champion": holdout_predictions(champion, holdout),
+        "Challenger": holdout_predictions(challenger, holdout, cache=False),
+    }
+    actual = np.expm1(holdout["y"])
+    predictions = {name: np.expm1(predicted) for name, predicted in log_predictions.items()}
+
+    segments = []
+    for column in Segment_columns:
+        codes, labels = holdout[f"{column}_codes"], holdout[f"{column}_labels"]
+        for name, predicted in predictions.items():
+            errors = _segment_errors(codes, labels, actual, predicted)
+            errors.insert(0, "Model", name)
+            errors.insert(0, "Segment_Type", column)
+            segments.append(errors)
+
+    return {
+        "holdout_version": holdout["version"],
+        "overall": _overall_metrics(holdout["y"], log_predictions),
+        "amount_overall": _overall_metrics(actual, predictions),
+        "segments": pd.concat(segments, ignore_index=True),
+        "challenger_predictions": log_predictions["Challenger"],
+    }
@@ -0,0 +1,259 @@
+import os
+import numpy as np
+import pandas as pd
+from models import model_version, Categorical_features
+
+
+# Flattened forest of the model version last used; a promotion replaces it
+_flat_forests = {}
+
+# Array entries of a flattened forest (the rest are scalars)
+Flat_arrays = ["children", "delta", "feature", "threshold", "value", "roots"]
+
+# Upper bound on (row, tree) pairs walked at once, keeps memory flat on big batches
+Chunk_pairs = 500_000
+
+# apply() has a fixed per-call cost, so interval batches use bigger chunks (~80MB of leaf values)
+Interval_chunk_pairs = 10_000_000
+
+
+def flatten_forest(model):
+    """
+    Concatenate every tree of a fitted RandomForest into flat node arrays.
+    Leaves point to themselves so a traversal can run a fixed number of steps,
+    and each edge carries the change in node value it causes.
+    """
+    version = model_version(model)
+    if version in _flat_forests:
+        return _flat_forests[version]
+
+    children, deltas, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left < 0
+        value = tree.value[:, 0, 0]
+
+        # Interleave (left, right) per node so a step is child[2 * node + went_right]
+        left = np.where(is_leaf, nodes, tree.children_left)
+        right = np.where(is_leaf, nodes, tree.children_right)
+        children.append(np.column_stack([left, right]).ravel() + offset)
+        deltas.append(np.column_stack([value[left] - value, value[right] - value]).ravel())
+
+        features.append(np.where(is_leaf, -1, tree.feature))
+        thresholds.append(tree.threshold)
+        values.append(value)
+        roots.append(offset)
+
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    flat = {
+        "children": np.concatenate(children).astype(np.intp),
+        "delta": np.concatenate(deltas),
+        "feature": np.concatenate(features).astype(np.intp),
+        "threshold": np.concatenate(thresholds),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.intp),
+        "max_depth": max_depth,
+        "n_features": model.n_features_in_,
+    }
+    _flat_forests.clear()
+    _flat_forests[version] = flat
+    return flat
+
+
+def _as_matrix(X):
+    # Trees compare features in float32, so cast the same way to land on the same leaves
+    return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+
+def _path_contributions(flat, X):
+    """
+    Walk all rows down all trees together, one depth level per step.
+    Returns the summed (not averaged) per-feature contributions over trees.
+    """
+    n_rows = X.shape[0]
+    n_features = flat["n_features"]
+    n_trees = len(flat["roots"])
+
+    # Tree-major order keeps each step's node lookups inside one tree's arrays
+    rows = np.tile(np.arange(n_rows), n_trees)
+    nodes = np.repeat(flat["roots"], n_rows)
+    cells = X.ravel()
+    contributions = np.zeros(n_rows * n_features)
+
+    for _ in range(flat["max_depth"]):
+        feature = flat["feature"].take(nodes)
+        active = feature >= 0
+        if not active.all():
+            rows, nodes, feature = rows[active], nodes[active], feature[active]
+        if len(nodes) == 0:
+            break
+
+        # Flat (row, feature) index doubles as the bincount bucket
+        cell = rows * n_features + feature
+        edge = 2 * nodes + (cells.take(cell) > flat["threshold"].take(nodes))
+        contributions += np.bincount(
+            cell,
+            weights=flat["delta"].take(edge),
+            minlength=n_rows * n_features
+        )
+        nodes = flat["children"].take(edge)
+
+    return contributions.reshape(n_rows, n_features)
+
+
+def explain_predictions(model, X):
+    """
+    Tree-path decomposition of RandomForest predictions.
+    Each prediction (log scale) equals bias + the sum of its row of contributions.
+    """
+    flat = flatten_forest(model)
+    matrix = _as_matrix(X)
+    n_trees = len(flat["roots"])
+
+    chunk = max(1, Chunk_pairs // n_trees)
+    contributions = np.vstack([
+        _path_contributions(flat, matrix[start:start + chunk])
+        for start in range(0, max(len(matrix), 1), chunk)
+    ]) / n_trees
+
+    bias = flat["value"][flat["roots"]].mean()
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is None:
+        columns = [f"feature_{i}" for i in range(flat["n_features"])]
+    index = X.index if isinstance(X, pd.DataFrame) else None
+
+    return bias, pd.DataFrame(contributions, columns=list(columns), index=index)
+
+
+def group_contributions(contributions):
+    """
+    Fold one-hot columns back onto their source feature, e.g. every
+    Claim_Type_* column is summed into Claim_Type.
+    """
+    grouped = {}
+    for column in contributions.columns:
+        source = next(
+            (cat for cat in Categorical_features if column.startswith(cat + "_")),
+            column
+        )
+        grouped.setdefault(source, []).append(column)
+
+    return pd.DataFrame(
+        {source: contributions[cols].sum(axis=1) for source, cols in grouped.items()},
+        index=contributions.index
+    )
+
+
+def leaf_values(flat, X):
+    """
+    Per-tree outputs (log scale) from the flattened forest alone, shape
+    (n_rows, n_trees). Used where only the flat arrays are at hand, e.g.
+    memory-mapped in a worker process.
+    """
+    n_rows = X.shape[0]
+    n_features = flat["n_features"]
+    n_trees = len(flat["roots"])
+
+    rows = np.tile(np.arange(n_rows), n_trees)
+    nodes = np.repeat(flat["roots"], n_rows)
+    cells = X.ravel()
+    active = np.arange(len(nodes))
+
+    for _ in range(flat["max_depth"]):
+        feature = flat["feature"].take(nodes[active])
+        keep = feature >= 0
+        active, feature = active[keep], feature[keep]
+        if len(active) == 0:
+            break
+
+        current = nodes[active]
+        edge = 2 * current + (cells.take(rows[active] * n_features + feature) > flat["threshold"].take(current))
+        nodes[active] = flat["children"].take(edge)
+
+    return flat["value"].take(nodes).reshape(n_trees, n_rows).T
+
+
+def save_flat_forest(flat, directory):
+    """
+    One .npy file per flat array, so other processes can memory-map them.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for key, value in flat.items():
+        np.save(os.path.join(directory, f"{key}.npy"), np.asarray(value))
+
+
+def load_flat_forest(directory, mmap_mode="r"):
+    flat = {}
+    for key in Flat_arrays:
+        flat[key] = np.load(os.path.join(directory, f"{key}.npy"), mmap_mode=mmap_mode)
+    for key in ["max_depth", "n_features"]:
+        flat[key] = int(np.load(os.path.join(directory, f"{key}.npy")))
+    return flat
+
+
+def tree_predictions(model, X):
+    """
+    Per-tree outputs (log scale) for every row, shape (n_rows, n_trees).
+    One apply() call finds every leaf; leaf values are then gathered from
+    the flattened forest instead of calling each estimator's predict.
+    """
+    flat = flatten_forest(model)
+    leaves = model.apply(X)
+    return flat["value"].take(leaves + flat["roots"])
+
+
+def _intervals(per_tree_outputs, X, n_trees, chunk_pairs, quantiles):
+    chunk = max(1, chunk_pairs // n_trees)
+
+    # Linear interpolation between order statistics, as np.percentile does,
+    # but one in-place row sort is much cheaper than percentile's partitioning
+    position = np.asarray(quantiles, dtype=float) / 100 * (n_trees - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.ceil(position).astype(int)
+    weight = position - lower
+
+    predictions, bounds = [], []
+    for start in range(0, max(len(X), 1), chunk):
+        per_tree = per_tree_outputs(X[start:start + chunk])
+        predictions.append(per_tree.mean(axis=1))
+        per_tree.sort(axis=1)
+
+        # expm1 is monotonic, so the sorted log-scale outputs are the sorted £ amounts;
+        # interpolate after converting so bounds match percentiles of the £ amounts
+        bounds.append(np.expm1(per_tree[:, lower]) * (1 - weight) + np.expm1(per_tree[:, upper]) * weight)
+
+    result = pd.DataFrame(
+        np.vstack(bounds),
+        columns=[f"P{q}" for q in quantiles],
+        index=X.index if isinstance(X, pd.DataFrame) else None
+    )
+    result.insert(0, "Predicted_Amount", np.expm1(np.concatenate(predictions)))
+    return result
+
+
+def predict_with_intervals(model, X, quantiles=(10, 50, 90)):
+    """
+    Point prediction and percentile interval of the ultimate claim amount,
+    taken across the forest's per-tree outputs.
+    """
+    n_trees = len(flatten_forest(model)["roots"])
+    return _intervals(
+        lambda chunk: tree_predictions(model, chunk),
+        X, n_trees, Interval_chunk_pairs, quantiles
+    )
+
+
+def predict_flat_with_intervals(flat, X, quantiles=(10, 50, 90)):
+    """
+    Same as predict_with_intervals, from the flattened forest arrays only.
+    """
+    return _intervals(
+        lambda chunk: leaf_values(flat, _as_matrix(chunk)),
+        X, len(flat["roots"]), Chunk_pairs, quantiles
+    )
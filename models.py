@@ -1,9 +1,11 @@
 import joblib
 import os
+import hashlib
+import weakref
 import pandas as pd 
 import numpy as np
 from sklearn.model_selection import train_test_split, GridSearchCV, RandomizedSearchCV
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error, root_mean_squared_error
+from sklearn.metrics import r2_score, mean_absolute_error, root_mean_squared_error
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from huggingface_hub import hf_hub_download
@@ -22,6 +24,14 @@ Features = ['Claim_Type', 'Estimated_Claim_Amount', 'Traffic_Condition',
 
 Target = ['Ultimate_Claim_Amount']
 
+Categorical_features = ['Claim_Type', 'Traffic_Condition',
+                        'Weather_Condition', 'Vehicle_Type'
+]
+
+Date_columns = ['Accident_Date', 'FNOL_Date', 'Settlement_Date',
+                'Date_of_Birth', 'Full_License_issue_Date'
+]
+
 
 # Functions to load model and feature columns
 # def load_model():
@@ -36,7 +46,16 @@ MODEL_FILENAME = "best_model.pkl"
 FEATURES_FILENAME = "feature_columns.pkl"
 
 def load_model():
-    # Download Model and feature columns from Hugging Face
+    # A model promoted by retrain_model is saved locally and takes precedence
+    if os.path.exists(Model_path):
+        model = joblib.load(Model_path)
+        if os.path.exists(Features_path):
+            feature_columns = joblib.load(Features_path)
+        else:
+            feature_columns = list(model.feature_names_in_)
+        return model, feature_columns
+
+    # Otherwise download Model and feature columns from Hugging Face
     model_path = hf_hub_download(
         repo_id = REPO_ID,
         filename = MODEL_FILENAME
@@ -54,7 +73,51 @@ def load_model():
     return model, feature_columns
 
 
+# Fingerprints are memoised per loaded model object so repeated lookups are free
+_model_versions = weakref.WeakKeyDictionary()
+
+def model_version(model):
+    """
+    Return a short content fingerprint of a fitted forest.
+    Used as the cache key for anything derived from the model.
+    """
+    try:
+        return _model_versions[model]
+    except (KeyError, TypeError):
+        pass
+
+    digest = hashlib.sha1()
+    digest.update(",".join(map(str, getattr(model, "feature_names_in_", []))).encode())
+    for estimator in getattr(model, "estimators_", []):
+        tree = estimator.tree_
+        digest.update(tree.feature.tobytes())
+        digest.update(tree.threshold.tobytes())
+        digest.update(tree.value.tobytes())
+    version = digest.hexdigest()[:12]
+
+    try:
+        _model_versions[model] = version
+    except TypeError:
+        pass
+    return version
+
+
+def encode_features(raw_data, feature_columns):
+    """
+    One-hot encode raw claim rows exactly as during training
+    and align them with the model's feature space.
+    """
+    encoded = pd.get_dummies(
+        raw_data[Features],
+        columns=Categorical_features,
+        drop_first=False,
+        dtype=int
+    )
+    return encoded.reindex(columns=feature_columns, fill_value=0)
+
+
 def save_model(model, versioned = False):
+    os.makedirs("models", exist_ok=True)
     if versioned:
         # find next available version number
         version = 1
@@ -77,15 +140,54 @@ def winsorize(df, column):
     df[column] = df[column].clip(lower_bound, upper_bound)
     return df
 
+def parse_dates(df):
+    """
+    Parse the claim date columns present in df (CSV uploads hold them as text).
+    Unparseable dates become NaT.
+    """
+    for col in Date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+def claim_keys(df):
+    """
+    Stable per-claim key: Claim_ID where the data has it, otherwise a hash of
+    the raw claim fields and dates. Taken before winsorizing, whose bounds
+    move with every upload, so the same claim gets the same key each time.
+    """
+    if "Claim_ID" in df.columns:
+        return df["Claim_ID"].astype(str).to_numpy()
+
+    columns = [col for col in Features + Target + Date_columns if col in df.columns]
+    raw = df[columns].copy()
+    for col in columns:
+        # Same values hash the same whether a column was read as int or float,
+        # and however the last digit came back from a CSV round trip
+        if pd.api.types.is_numeric_dtype(raw[col]):
+            raw[col] = raw[col].astype(float).round(6)
+    return pd.util.hash_pandas_object(raw, index=False).astype(str).to_numpy()
+
+def derive_durations(df):
+    """
+    Reporting delay and settlement time in days, from the claim dates.
+    Open claims (no Settlement_Date) get a missing Settlement_days.
+    """
+    df = parse_dates(df)
+    df["FNOL_delay_(days)"] = (df["FNOL_Date"] - df["Accident_Date"]).dt.days
+    df["Settlement_days"] = (df["Settlement_Date"] - df["FNOL_Date"]).dt.days
+    return df
+
 def retrain_model(new_data):
 
     new_data = new_data.copy() # prevent side effects
+    new_data = parse_dates(new_data)
+    keys = claim_keys(new_data)
 
     # Derived features
     new_data["Driver_age"] = (new_data["Accident_Date"] - new_data["Date_of_Birth"]).dt.days // 365
     new_data["License_age"] = (new_data["Accident_Date"] - new_data["Full_License_issue_Date"]).dt.days // 365
-    new_data["Fnol_delay"] = (new_data["FNOL_Date"] - new_data["Accident_Date"]).dt.days
-    new_data["Settlement_Days"] = (new_data["Settlement_Date"] - new_data["FNOL_Date"]).dt.days
+    new_data = derive_durations(new_data)
 
     # Fix outliers usind winsorize function
     outlier_columns =[
@@ -117,6 +219,9 @@ def retrain_model(new_data):
     # Fix: warap target in list
     new_data = new_data[features + [target]]
 
+    # Keep raw segments for per-segment holdout error
+    segments = new_data[['Claim_Type', 'Vehicle_Type']].copy()
+
     # One-hot encoding categorical columns
     categorical_features = [
         'Claim_Type',  
@@ -133,39 +238,61 @@ def retrain_model(new_data):
     )
 
     # Load production model
-    prod_model = load_model()
+    prod_model, feature_columns = load_model()
 
     # IMPORTANT FIX: align dummy columns to predict() to avoind errors
     expected_cols = list(prod_model.feature_names_in_)
-    new_data = new_data.reindex(columns=expected_cols + [target])
+    new_data = new_data.reindex(columns=expected_cols + [target], fill_value=0)
 
     X = new_data.drop(columns=[target])
     y = new_data[target]
 
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size = 0.2, random_state= 42
-    )
-
-    # Evaluate production model
-    y_pred_prod = prod_model.predict(X_test)
-    rmse_prod = mean_squared_error(y_test, y_pred_prod, squared=False)
+    # evaluation imports models, so import it here to avoid a cycle
+    from evaluation import load_holdout, create_holdout, compare_models, save_holdout_predictions
+
+    # Persistent holdout: split once from the first upload, then reused so
+    # every challenger is judged on the same claims
+    # Holdouts saved before claim keys were stored cannot be matched, so start a new version
+    holdout = load_holdout()
+    if holdout is None or "claim_keys" not in holdout:
+        X_train, X_test, y_train, y_test, _, segments_test, _, keys_test = train_test_split(
+            X, y, segments, keys, test_size = 0.2, random_state= 42
+        )
+        create_holdout(X_test, y_test, segments_test, keys_test)
+        holdout = load_holdout()
+    else:
+        # Keep holdout claims out of training
+        in_holdout = np.isin(keys, holdout["claim_keys"])
+        X_train, y_train = X[~in_holdout], y[~in_holdout]
 
     # Train new model with same parameters
     new_model = RandomForestRegressor(**prod_model.get_params())
     new_model.fit(X_train, y_train)
 
-    y_pred_new = new_model.predict(X_test)
-    rmse_new = mean_squared_error(y_test, y_pred_new, squared=False)
+    # Champion predictions on the holdout are cached, so this is one predict.
+    # Promotion is judged on log-scale RMSE, the scale the model is trained on
+    comparison = compare_models(prod_model, new_model, holdout)
+    rmse = comparison["overall"].set_index("Metric").loc["RMSE"]
+    rmse_prod, rmse_new = rmse["Champion"], rmse["Challenger"]
 
     # Promote if better
     promoted = False
+    model_path = None
     if rmse_new < rmse_prod:
-        save_model(new_model)
+        model_path = save_model(new_model)
+        joblib.dump(expected_cols, Features_path)
+        # The new champion's holdout predictions are cached for the next comparison
+        save_holdout_predictions(new_model, holdout, comparison["challenger_predictions"])
         promoted = True
 
     return {
         "rmse_old": rmse_prod,
         "rmse_new": rmse_new,
-        "promoted": promoted
-    }
\ No newline at end of file
+        "promoted": promoted,
+        "model_path": model_path,
+        "feature_columns": expected_cols,
+        "holdout_version": comparison["holdout_version"],
+        "metrics": comparison["overall"],
+        "amount_metrics": comparison["amount_overall"],
+        "segment_errors": comparison["segments"]
+    }
@@ -1,7 +1,39 @@
 import streamlit as st  
 import pandas as pd     
 import numpy as np
-from models import load_model
+import matplotlib.pyplot as plt
+import seaborn as sns
+from models import load_model, encode_features
+from forest import explain_predictions, group_contributions, predict_with_intervals
+from sensitivity import sensitivity_sweep
+from similar_claims import similar_claims
+
+
+@st.cache_resource(show_spinner=False)
+def get_model():
+    """
+    Keep one loaded model per session so model-version caches stay warm.
+    """
+    return load_model()
+
+
+def explain_claim(model, input_encoded):
+    """
+    Per-feature drivers of a single prediction, as log-scale contributions
+    and the percentage change each one applies to the predicted amount.
+    """
+    bias, contributions = explain_predictions(model, input_encoded)
+    drivers = group_contributions(contributions).iloc[0]
+
+    explanation = pd.DataFrame({
+        "Feature": drivers.index,
+        "Contribution": drivers.values,
+        "Impact (%)": np.expm1(drivers.values) * 100
+    })
+    explanation = explanation.reindex(
+        explanation["Contribution"].abs().sort_values(ascending=False).index
+    )
+    return bias, explanation
 
 
 def FNOL_prediction(claims_data):
@@ -87,38 +119,34 @@ def FNOL_prediction(claims_data):
         """)
 
 
+    # Raw input, named as the training columns
+    base_input = {
+        "Claim_Type": str(claim_type),
+        "Estimated_Claim_Amount": estimated_claim,
+        "Traffic_Condition": str(Traffic_Condition),
+        "Weather_Condition": str(Weather_Condition),
+        "Vehicle_Type": str(Vehicle_Type),
+        "Vehicle_Year": Vehicle_Year,
+        "Driver_age_(years)": Driver_age,
+        "License_age_(years)": license_age
+    }
+
     if predict_button:
         st.markdown("---")
         st.subheader("Prediction Results")
 
         try:
             # Load model + feature columns
-            model, feature_columns = load_model()
-
-            # Raw input(No manual category expansion here)
-            input_data = pd.DataFrame({
-                "Claim_Type": [str(claim_type)],
-                "Estimated_Claim_Amount": [estimated_claim],
-                "Traffic_Condition": [str(Traffic_Condition)],
-                "Weather_Condition": [str(Weather_Condition)],
-                "Vehicle_Type": [str(Weather_Condition)],
-                "Vehicle_Year": [Vehicle_Year],
-                "Driver_age": [Driver_age],
-                "License_age": [license_age]
-            })
-
-            # one-hot encode exactly during training
-            input_encoded = pd.get_dummies(input_data, drop_first=False)
-
-            # Align feature space with training
-            input_encoded = input_encoded.reindex(
-                columns=feature_columns,
-                fill_value=0
-            )
+            model, feature_columns = get_model()
+
+            input_data = pd.DataFrame([base_input])
+
+            # one-hot encode exactly as during training and align feature space
+            input_encoded = encode_features(input_data, feature_columns)
 
             with st.spinner("Making prediction..."):
-                prediction = model.predict(input_encoded)
-                predicted_amount = np.expm1(prediction[0])
+                prediction = predict_with_intervals(model, input_encoded).iloc[0]
+                predicted_amount = prediction["Predicted_Amount"]
 
             col_result1, col_result2, col_result3 = st.columns(3)
 
@@ -141,16 +169,160 @@ def FNOL_prediction(claims_data):
                     f"{variance:+.1f}%"
                 )
 
+            # ---------- Reserving Range ----------
+            st.markdown("**Reserving Range (spread across the forest's trees)**")
+            col_range1, col_range2, col_range3 = st.columns(3)
+
+            with col_range1:
+                st.metric("P10 (Optimistic)", f"£{prediction['P10']:,.2f}")
+
+            with col_range2:
+                st.metric("P50 (Median)", f"£{prediction['P50']:,.2f}")
+
+            with col_range3:
+                st.metric("P90 (Prudent)", f"£{prediction['P90']:,.2f}")
+
+            if estimated_claim > prediction["P90"] or estimated_claim < prediction["P10"]:
+                st.caption("The estimated claim amount falls outside the P10-P90 range.")
+
+            bias, explanation = explain_claim(model, input_encoded)
+
             st.success("Prediction completed successfully!")
             if predicted_amount > estimated_claim:
+                upward = explanation.loc[explanation["Contribution"] > 0, "Feature"].head(3)
                 st.warning(
-                    "Predicted amount is higher than estimated claim. Additional review may be required"
+                    "Predicted amount is higher than estimated claim. Additional review may be required. "
+                    f"Main upward drivers: {', '.join(upward) if len(upward) else 'none'}"
                 )
             else:
                 st.info(
                     "Predicted amount is within or below the estimate"
                 )
+
+            # ---------- Prediction Explanation ----------
+            st.markdown("---")
+            st.subheader("Why this prediction?")
+            st.caption(
+                f"Starting from a baseline claim of £{np.expm1(bias):,.2f}, "
+                "each feature scales the prediction up or down by the impact shown."
+            )
+
+            col_exp1, col_exp2 = st.columns([2, 1])
+
+            with col_exp1:
+                plot_df = explanation.iloc[::-1]
+                fig, ax = plt.subplots(figsize=(8, 4))
+                ax.barh(
+                    plot_df["Feature"],
+                    plot_df["Impact (%)"],
+                    color=np.where(plot_df["Impact (%)"] > 0, "indianred", "seagreen")
+                )
+                ax.axvline(0, color="grey", linewidth=0.8)
+                ax.set_xlabel("Impact on predicted amount (%)")
+                plt.tight_layout()
+                st.pyplot(fig)
+
+            with col_exp2:
+                formatted_explanation = explanation[["Feature", "Impact (%)"]].copy()
+                formatted_explanation["Impact (%)"] = formatted_explanation["Impact (%)"].map(
+                    lambda x: f"{x:+.1f}%"
+                )
+                st.dataframe(formatted_explanation, use_container_width=True, hide_index=True)
+
+            # ---------- Similar Past Claims ----------
+            st.markdown("---")
+            st.subheader("Similar Past Claims")
+
+            with st.spinner("Finding similar claims..."):
+                neighbours = similar_claims(claims_data, feature_columns, input_encoded, k=5)
+
+            col_sim1, col_sim2 = st.columns(2)
+            with col_sim1:
+                st.metric(
+                    "Average Ultimate of Similar Claims",
+                    f"£{neighbours['Ultimate_Claim_Amount'].mean():,.2f}"
+                )
+            if "Settlement_days" in neighbours.columns:
+                with col_sim2:
+                    st.metric(
+                        "Average Settlement Time",
+                        f"{neighbours['Settlement_days'].mean():,.0f} days"
+                    )
+
+            st.dataframe(neighbours.round(2), use_container_width=True, hide_index=True)
         except Exception as e:
             st.error(f"Error making prediction: {e}")
             st.info("Please check if the model and feature columns are correctly loaded.")
 
+    st.markdown("---")
+    if st.checkbox("🔍 Sensitivity mode: see how the prediction responds to changing one or two details"):
+        sensitivity_analysis(claims_data, base_input)
+
+
+def sweep_options(claims_data):
+    """
+    Fields that can be varied on the sensitivity page and the values swept for each.
+    """
+    max_estimate = claims_data["Estimated_Claim_Amount"].max()
+    return {
+        "Driver Age": ("Driver_age_(years)", list(range(18, 101))),
+        "License Age": ("License_age_(years)", list(range(0, 81))),
+        "Vehicle Year": ("Vehicle_Year", list(range(
+            int(claims_data["Vehicle_Year"].min()),
+            int(claims_data["Vehicle_Year"].max()) + 1
+        ))),
+        "Estimated Claim Amount": ("Estimated_Claim_Amount", list(np.linspace(0, max_estimate, 50).round(2))),
+        "Claim Type": ("Claim_Type", sorted(claims_data["Claim_Type"].astype(str).unique())),
+        "Traffic Condition": ("Traffic_Condition", sorted(claims_data["Traffic_Condition"].astype(str).unique())),
+        "Weather Condition": ("Weather_Condition", sorted(claims_data["Weather_Condition"].astype(str).unique())),
+        "Vehicle Type": ("Vehicle_Type", sorted(claims_data["Vehicle_Type"].astype(str).unique()))
+    }
+
+
+def sensitivity_analysis(claims_data, base_input):
+    st.subheader("What-if Sensitivity")
+    st.markdown("All other details are held at the values entered in the form above.")
+
+    options = sweep_options(claims_data)
+
+    col_s1, col_s2 = st.columns(2)
+    with col_s1:
+        x_label = st.selectbox("Vary", list(options.keys()))
+    with col_s2:
+        hue_label = st.selectbox(
+            "Split by (optional)",
+            ["None"] + [label for label in options if label != x_label]
+        )
+
+    x_col, x_values = options[x_label]
+    variations = {x_col: x_values}
+    hue_col = None
+    if hue_label != "None":
+        hue_col, hue_values = options[hue_label]
+        variations[hue_col] = hue_values
+
+    try:
+        model, feature_columns = get_model()
+
+        with st.spinner("Predicting scenarios..."):
+            result = sensitivity_sweep(model, feature_columns, base_input, variations)
+
+        fig, ax = plt.subplots(figsize=(12, 5))
+        if hue_col is None:
+            ax.plot(result[x_col], result["Predicted_Amount"], marker="o", color="dodgerblue", label="Predicted")
+            ax.fill_between(result[x_col], result["P10"], result["P90"], color="dodgerblue", alpha=0.2, label="P10-P90")
+        else:
+            sns.lineplot(data=result, x=x_col, y="Predicted_Amount", hue=hue_col, marker="o", ax=ax)
+
+        ax.axhline(base_input["Estimated_Claim_Amount"], color="grey", linestyle="--", label="Estimated claim")
+        ax.set_xlabel(x_label)
+        ax.set_ylabel("Predicted Ultimate Amount (£)")
+        ax.tick_params(axis="x", rotation=45)
+        ax.legend()
+        plt.tight_layout()
+        st.pyplot(fig)
+
+        st.caption(f"{len(result):,} scenarios predicted in a single pass.")
+    except Exception as e:
+        st.error(f"Error running sensitivity analysis: {e}")
+        st.info("Please check if the model and feature columns are correctly loaded.")
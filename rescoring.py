@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numpy.lib.format import open_memmap
+from models import model_version, encode_features
+from forest import flatten_forest, save_flat_forest, load_flat_forest, predict_flat_with_intervals
+from claims_store import prediction_versions, write_prediction_columns, Prediction_prefix
+
+
+Rescore_dir = "models/rescoring"
+Shard_size = 250_000
+
+# Output columns, in the order they are written to the shared result matrix
+Score_columns = ["Predicted_Amount", "P10", "P50", "P90"]
+Interval_prefixes = {"P10": "P10_Ultimate_", "P50": "P50_Ultimate_", "P90": "P90_Ultimate_"}
+
+
+# Each worker process memory-maps the flattened forest once and reuses it for every shard
+_worker_forests = {}
+
+def _score_shard(run_dir, start, stop):
+    if run_dir not in _worker_forests:
+        _worker_forests[run_dir] = load_flat_forest(os.path.join(run_dir, "forest"), mmap_mode="r")
+    flat = _worker_forests[run_dir]
+
+    matrix = np.load(os.path.join(run_dir, "claims.npy"), mmap_mode="r")
+    output = np.load(os.path.join(run_dir, "scores.npy"), mmap_mode="r+")
+
+    output[start:stop] = predict_flat_with_intervals(flat, matrix[start:stop])[Score_columns].to_numpy()
+    output.flush()
+    return stop - start
+
+
+def rescore_portfolio(model_path, claims_data, feature_columns, n_workers=None, progress_callback=None):
+    """
+    Re-score every stored claim with the model at model_path.
+    The forest is flattened to plain .npy arrays and the claims encoded once,
+    so workers memory-map both instead of each unpickling their own copy;
+    scores go to a shared result file. All run files are removed afterwards.
+    Versioned prediction columns are written back to the claims store, and
+    the reserve movement is reported for open claims.
+    """
+    model = joblib.load(model_path)
+    version = model_version(model)
+    n_claims = len(claims_data)
+
+    os.makedirs(Rescore_dir, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix=f"run_{version}_", dir=Rescore_dir)
+    try:
+        save_flat_forest(flatten_forest(model), os.path.join(run_dir, "forest"))
+        np.save(
+            os.path.join(run_dir, "claims.npy"),
+            encode_features(claims_data, feature_columns).to_numpy(dtype=np.float32)
+        )
+        output_path = os.path.join(run_dir, "scores.npy")
+        open_memmap(output_path, mode="w+", dtype=np.float64, shape=(n_claims, len(Score_columns))).flush()
+
+        # Spawned workers start clean rather than forking Streamlit's threads and locks
+        scored = 0
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_score_shard, run_dir, start, min(start + Shard_size, n_claims))
+                for start in range(0, n_claims, Shard_size)
+            ]
+            for future in as_completed(futures):
+                scored += future.result()
+                if progress_callback is not None:
+                    progress_callback(scored, n_claims)
+
+        scores = np.load(output_path)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    columns = pd.DataFrame({Prediction_prefix + version: scores[:, 0]})
+    for i, column in enumerate(Score_columns[1:], start=1):
+        columns[Interval_prefixes[column] + version] = scores[:, i]
+
+    # Written against the latest store, so claims other sessions appended meanwhile are kept
+    claims_data = write_prediction_columns(claims_data, columns)
+    rescored = claims_data.iloc[:n_claims]
+
+    # Only open claims hold a reserve; settled claims are rescored but not counted in the movement
+    open_claims = rescored[pd.to_datetime(rescored["Settlement_Date"], errors="coerce").isna()]
+
+    # Reserve movement against the last rescore, or the case estimate for
+    # claims it did not score (first run, or appended since)
+    previous = [v for v in prediction_versions(claims_data) if v != version]
+    baseline = open_claims["Estimated_Claim_Amount"]
+    if previous:
+        baseline = open_claims[Prediction_prefix + previous[-1]].fillna(baseline)
+
+    deltas = open_claims[Prediction_prefix + version] - baseline
+    reserve_deltas = deltas.groupby(open_claims["Claim_Type"]).agg(["sum", "mean", "count"]).round(2)
+    reserve_deltas.columns = ["Total_Delta", "Avg_Delta", "Claim_Count"]
+
+    return {
+        "model_version": version,
+        "claims_data": claims_data,
+        "claims_rescored": n_claims,
+        "open_claims": len(open_claims),
+        "reserve_delta_total": float(deltas.sum()),
+        "reserve_deltas": reserve_deltas.reset_index()
+    }
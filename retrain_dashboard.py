@@ -2,6 +2,9 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from models import retrain_model
+from rescoring import rescore_portfolio
+from claims_store import append_claims
+from prediction import get_model
 
 
 
@@ -16,16 +19,118 @@ def show_retraining_ui():
         st.write("Preview of uploaded data:")
         st.dataframe(new_data.head)
 
+        # Each upload is added once, however often the button is clicked
+        already_added = st.session_state.get("appended_upload") == uploaded_file.file_id
+        if st.button("Add Claims to Claims Store", disabled=already_added):
+            claims_data, n_added = append_claims(st.session_state["claims_data"], new_data)
+            st.session_state["claims_data"] = claims_data
+            st.session_state["appended_upload"] = uploaded_file.file_id
+            skipped = len(new_data) - n_added
+            st.success(
+                f"Added {n_added:,} claims ({skipped:,} already in the store were skipped). "
+                "Similar-claims search picks them up on the next prediction."
+            )
+        elif already_added:
+            st.info("This upload has already been added to the claims store.")
+
         if st.button("Retrain Model"):
             with st.spinner("Retraining model..."):
                 result = retrain_model(new_data)
                 st.success("Retraining completed!")
 
-                st.write(f"Old RMSE: {result["rmse_old"]:.2f}")
-                st.write(f"New RMSE: {result["rmse_new"]:.2f}")
+                st.write(f"Old RMSE (log scale): {result['rmse_old']:.4f}")
+                st.write(f"New RMSE (log scale): {result['rmse_new']:.4f}")
+
+                show_holdout_comparison(result)
 
                 if result["promoted"]:
                     st.balloons()
                     st.success("New model promoted to Production")
+                    # Serve the promoted model from the next prediction on
+                    get_model.clear()
+                    show_portfolio_rescoring(result)
                 else:
-                    st.info("New model was NOT better, production model retrained")
\ No newline at end of file
+                    st.info("New model was NOT better, production model retrained")
+
+
+def show_holdout_comparison(result):
+    """
+    Champion vs challenger on the persistent holdout, overall and per segment.
+    """
+    st.subheader(f"🏆 Champion vs Challenger (holdout v{result['holdout_version']})")
+
+    st.markdown("**Log Scale** (used for promotion)")
+    formatted_metrics = result["metrics"].copy()
+    for col in ["Champion", "Challenger"]:
+        formatted_metrics[col] = formatted_metrics[col].map(lambda x: f"{x:.4f}")
+    st.dataframe(formatted_metrics, use_container_width=True, hide_index=True)
+
+    st.markdown("**Claim Amount (£)**")
+    formatted_amounts = result["amount_metrics"].copy()
+    for col in ["Champion", "Challenger"]:
+        formatted_amounts[col] = [
+            f"{value:.3f}" if metric == "R2" else f"£{value:,.2f}"
+            for metric, value in zip(formatted_amounts["Metric"], formatted_amounts[col])
+        ]
+    st.dataframe(formatted_amounts, use_container_width=True, hide_index=True)
+
+    st.markdown("**Error by Segment**")
+    segment_errors = result["segment_errors"].pivot_table(
+        index=["Segment_Type", "Segment", "Claim_Count"],
+        columns="Model",
+        values=["MAE", "RMSE"]
+    )
+    segment_errors.columns = [f"{model} {metric} (£)" for metric, model in segment_errors.columns]
+    segment_errors = segment_errors.reset_index().rename(columns={
+        "Segment_Type": "Segment Type",
+        "Claim_Count": "Number of Claims"
+    })
+    st.dataframe(segment_errors.round(2), use_container_width=True, hide_index=True)
+
+
+def show_portfolio_rescoring(result):
+    """
+    Re-score every stored claim with the newly promoted model and
+    show how reserves on open claims move.
+    """
+    st.subheader("📦 Portfolio Rescoring")
+
+    claims_data = st.session_state.get("claims_data")
+    if claims_data is None:
+        st.info("No claims data loaded, skipping portfolio rescoring.")
+        return
+
+    progress = st.progress(0.0, text="Rescoring stored claims...")
+
+    def update_progress(done, total):
+        progress.progress(done / total, text=f"Rescored {done:,} of {total:,} claims")
+
+    rescored = rescore_portfolio(
+        result["model_path"],
+        claims_data,
+        result["feature_columns"],
+        progress_callback=update_progress
+    )
+    st.session_state["claims_data"] = rescored["claims_data"]
+
+    st.success(
+        f"Rescored **{rescored['claims_rescored']:,} claims** with model version "
+        f"**{rescored['model_version']}**"
+    )
+    st.metric(
+        f"Total Reserve Delta ({rescored['open_claims']:,} open claims)",
+        f"£{rescored['reserve_delta_total']:+,.2f}"
+    )
+
+    formatted_deltas = rescored["reserve_deltas"].copy()
+    for col in ["Total_Delta", "Avg_Delta"]:
+        formatted_deltas[col] = formatted_deltas[col].map(lambda x: f"£{x:+,.2f}")
+    formatted_deltas["Claim_Count"] = formatted_deltas["Claim_Count"].map(lambda x: f"{x:,}")
+
+    formatted_deltas = formatted_deltas.rename(columns={
+        "Claim_Type": "Claim Type",
+        "Total_Delta": "Total Reserve Delta (£)",
+        "Avg_Delta": "Average Reserve Delta (£)",
+        "Claim_Count": "Number of Open Claims"
+    })
+    st.dataframe(formatted_deltas, use_container_width=True, hide_index=True)
@@ -0,0 +1,47 @@
+import pandas as pd
+from models import model_version, encode_features
+from forest import predict_with_intervals
+
+
+# Swept predictions are cached per model version, oldest entries evicted first
+_sweep_cache = {}
+Max_cached_sweeps = 256
+
+
+def sensitivity_grid(base_input, variations):
+    """
+    Every combination of the varied fields, with all other fields held at
+    the base claim's values. One row per scenario.
+    """
+    grid = pd.MultiIndex.from_product(
+        list(variations.values()),
+        names=list(variations.keys())
+    ).to_frame(index=False)
+
+    for column, value in base_input.items():
+        if column not in variations:
+            grid[column] = value
+    return grid
+
+
+def sensitivity_sweep(model, feature_columns, base_input, variations):
+    """
+    Predict the whole what-if grid as a single encoded matrix and a single
+    forest pass. Returns the grid with prediction and interval columns.
+    """
+    key = (
+        model_version(model),
+        tuple(sorted((column, str(value)) for column, value in base_input.items())),
+        tuple((column, tuple(values)) for column, values in variations.items())
+    )
+    if key in _sweep_cache:
+        return _sweep_cache[key]
+
+    grid = sensitivity_grid(base_input, variations)
+    predictions = predict_with_intervals(model, encode_features(grid, feature_columns))
+    result = pd.concat([grid, predictions], axis=1)
+
+    if len(_sweep_cache) >= Max_cached_sweeps:
+        _sweep_cache.pop(next(iter(_sweep_cache)))
+    _sweep_cache[key] = result
+    return result
@@ -0,0 +1,140 @@
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+from models import encode_features, Features, Categorical_features
+from claims_store import generation_of, rows_at
+
+
+# Claim outcome columns returned with each neighbour, where the store has them
+Outcome_columns = ['Ultimate_Claim_Amount', 'Settlement_days', 'Settlement_Date']
+
+# Appended claims are searched brute force until there are this many, then the tree is rebuilt
+Min_rebuild_rows = 50_000
+Rebuild_fraction = 0.1
+
+# One live index per feature space, kept up to date as the store grows.
+# Sessions share it, so it is only read or changed under the lock
+_indexes = {}
+_index_lock = threading.RLock()
+
+
+class SimilarClaimsIndex:
+    """
+    Nearest-neighbour index over the encoded claim features.
+    Numeric features are standardised so no single feature dominates distance.
+    New claims go to a small pending buffer that is searched brute force,
+    and fold into the ball tree once the buffer grows large.
+    """
+
+    def __init__(self, claims_data, feature_columns):
+        self.feature_columns = list(feature_columns)
+        self.generation = generation_of(claims_data)
+
+        numeric = [col for col in Features if col not in Categorical_features]
+        stats = claims_data[numeric].agg(["mean", "std"])
+        self.center = pd.Series(0.0, index=self.feature_columns)
+        self.scale = pd.Series(1.0, index=self.feature_columns)
+        self.center[numeric] = stats.loc["mean"]
+        self.scale[numeric] = stats.loc["std"].replace(0, 1).fillna(1)
+
+        self._build(self._scaled(claims_data))
+
+    def _scaled(self, claims):
+        encoded = encode_features(claims, self.feature_columns)
+        return ((encoded - self.center) / self.scale).to_numpy(dtype=np.float64)
+
+    def _build(self, matrix):
+        self.indexed = matrix
+        self.tree = BallTree(matrix)
+        self.pending = np.empty((0, matrix.shape[1]))
+        self.pending_norms = np.empty(0)
+
+    @property
+    def n_claims(self):
+        return len(self.indexed) + len(self.pending)
+
+    def add(self, new_claims, generation):
+        """
+        Index claims appended to the store, keeping row positions in order.
+        """
+        self.generation = generation
+        if len(new_claims) == 0:
+            return
+        self.pending = np.vstack([self.pending, self._scaled(new_claims)])
+        self.pending_norms = (self.pending ** 2).sum(axis=1)
+        if len(self.pending) >= max(Min_rebuild_rows, Rebuild_fraction * len(self.indexed)):
+            self._build(np.vstack([self.indexed, self.pending]))
+
+    def query(self, input_encoded, k=5, n_rows=None):
+        """
+        Row positions (into the claims store) and distances of the k nearest
+        claims to each encoded input row, among the first n_rows claims.
+        """
+        n_rows = self.n_claims if n_rows is None else min(n_rows, self.n_claims)
+        # Claims past n_rows are newer than the caller's data: search enough extra to drop them
+        extra = self.n_claims - n_rows
+
+        query = ((input_encoded[self.feature_columns] - self.center) / self.scale).to_numpy(dtype=np.float64)
+        distances, positions = self.tree.query(query, k=min(k + extra, len(self.indexed)))
+
+        if len(self.pending):
+            # Brute force over the pending buffer, then merge with the tree's neighbours
+            squared = (query ** 2).sum(axis=1)[:, None] + self.pending_norms - 2 * query @ self.pending.T
+            pending_distances = np.sqrt(np.maximum(squared, 0))
+            distances = np.hstack([distances, pending_distances])
+            positions = np.hstack([
+                positions,
+                np.broadcast_to(np.arange(len(self.pending)) + len(self.indexed), pending_distances.shape)
+            ])
+
+        if len(self.pending) or extra:
+            distances = np.where(positions < n_rows, distances, np.inf)
+            order = np.argsort(distances, axis=1, kind="stable")[:, :min(k, n_rows)]
+            distances = np.take_along_axis(distances, order, axis=1)
+            positions = np.take_along_axis(positions, order, axis=1)
+
+        return distances, positions
+
+
+def get_index(claims_data, feature_columns):
+    """
+    Live index for this feature space. The claims store is append-only, so
+    if it has grown since the index was built only the new rows are indexed.
+    A caller holding older claims data is served by the same index.
+    """
+    key = tuple(feature_columns)
+    generation = generation_of(claims_data)
+
+    with _index_lock:
+        index = _indexes.get(key)
+        if index is not None and index.generation == generation:
+            return index
+
+        if index is not None and generation is not None:
+            # Store grew from the indexed rows: add just the new claims
+            if rows_at(index.generation, generation) == index.n_claims:
+                index.add(claims_data.iloc[index.n_claims:], generation)
+                return index
+            # Caller's data is older than the index: keep the index, the query drops newer rows
+            if rows_at(generation, index.generation) == len(claims_data):
+                return index
+
+        index = SimilarClaimsIndex(claims_data, feature_columns)
+        _indexes[key] = index
+        return index
+
+
+def similar_claims(claims_data, feature_columns, input_encoded, k=5):
+    """
+    The k most similar historical claims to a single encoded claim,
+    with their outcomes and distance.
+    """
+    with _index_lock:
+        index = get_index(claims_data, feature_columns)
+        distances, positions = index.query(input_encoded, k=k, n_rows=len(claims_data))
+
+    columns = Features + [col for col in Outcome_columns if col in claims_data.columns]
+    neighbours = claims_data.iloc[positions[0]][columns].copy()
+    neighbours.insert(0, "Similarity_Distance", distances[0])
+    return neighbours.reset_index(drop=True)